@@ -5,45 +5,109 @@ This extracts spawn points, warps, and collectible info for the server.
 """
 
 import os
-import re
+import sys
 import json
-import xml.etree.ElementTree as ET
+import pickle
+
+try:
+    # C-implemented serializer, several times faster for the room dump
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # lxml parses the GMX XML 10-20x faster than the pure-Python parser;
+    # the API is compatible for everything we use here.
+    from lxml import etree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
 from pathlib import Path
-from dataclasses import dataclass, asdict
-from typing import List, Dict, Optional, Any
+from dataclasses import dataclass
+from operator import attrgetter
+from typing import List, Dict, NamedTuple, Optional, Any
 
 # Room directory - use absolute path
 GMX_BASE = Path("/mnt/c/Users/datag/Documents/slime/slime2_decompile.gmx")
 GMX_ROOMS_DIR = GMX_BASE / "rooms"
 
-
-@dataclass
-class SpawnPoint:
+# Parsed-room cache so re-runs only parse files that actually changed
+_CACHE_PATH = Path(".cache/room_cache.pkl")
+
+# Category lookups for the per-instance dispatch; module-level frozensets
+# so membership is one hash lookup instead of rebuilding a list per instance
+_SHOP_OBJECTS = frozenset(
+    [
+        "obj_shop_item",
+        "obj_shop_call_item",
+        "obj_sell_sign",
+    ]
+)
+
+_SPECIAL_OBJECTS = frozenset(
+    [
+        "obj_bank",
+        "obj_mailbox",
+        "obj_storage_box",
+        "obj_save_bg",
+        "obj_clock_stand",
+        "obj_warpcenter",
+        "obj_clan_machine",
+        "obj_post_office",
+        "obj_gum_machine",
+        "obj_soda_machine",
+        "obj_upgrader",
+        "Planting_Field",
+        "Building_Spot",
+        "obj_drill",
+        "obj_race_machine",
+        "obj_race_start_ver",
+        "obj_race_start_hor",
+        "obj_race_end_ver",
+        "obj_race_end_hor",
+        "obj_teleporter",
+        "obj_music_changer",
+        "obj_billboard",
+        "obj_combinator",
+    ]
+)
+
+
+# NamedTuples rather than dataclasses: these are never mutated, and the
+# C tuple layout is smaller and faster than even a slotted class.
+# NamedTuple._asdict gives the same flat dict the export needs.
+class SpawnPoint(NamedTuple):
     x: int
     y: int
 
 
-@dataclass
-class Warp:
+class Warp(NamedTuple):
     x: int
     y: int
     warp_type: str  # warp_vert, warp_hor, warp_button, etc.
     next_room: Optional[int]
     new_x: Optional[int]
     new_y: Optional[int]
-    code: str  # Raw code for any extra parsing
 
 
-@dataclass
+@dataclass(slots=True)
 class Instance:
     obj_name: str
     x: int
     y: int
-    code: str
     instance_id: int
 
+    def _asdict(self) -> Dict[str, Any]:
+        return {
+            "obj_name": self.obj_name,
+            "x": self.x,
+            "y": self.y,
+            "instance_id": self.instance_id,
+        }
+
 
-@dataclass
+@dataclass(slots=True)
 class RoomData:
     name: str
     room_index: int  # Based on position in project
@@ -64,20 +128,27 @@ def parse_code_vars(code: str) -> Dict[str, Any]:
         return vars
 
     # Decode XML entities
-    code = code.replace("&#13;", "\r").replace("&#10;", "\n")
-
-    # Match patterns like: var_name = value
-    for match in re.finditer(r"(\w+)\s*=\s*([^\r\n]+)", code):
-        name = match.group(1).strip()
-        value = match.group(2).strip()
-
-        # Try to parse as number
-        try:
-            if "." in value:
-                vars[name] = float(value)
-            else:
-                vars[name] = int(value)
-        except ValueError:
+    code = code.replace("&#13;", "\n").replace("&#10;", "\n")
+
+    # The code bodies are simple "name = value" lines, so splitting on "="
+    # with str methods beats running a regex state machine per instance
+    for line in code.split("\n"):
+        name, sep, value = line.partition("=")
+        if not sep:
+            continue
+        name = name.strip()
+        value = value.strip()
+        if not name or not value:
+            continue
+
+        # Most values are plain strings; only attempt numeric conversion
+        # (and risk the exception path) when the value can start a number
+        if value[0] in "-.0123456789":
+            try:
+                vars[name] = float(value) if "." in value else int(value)
+            except ValueError:
+                vars[name] = value
+        else:
             vars[name] = value
 
     return vars
@@ -86,26 +157,19 @@ def parse_code_vars(code: str) -> Dict[str, Any]:
 def parse_room_file(filepath: Path) -> Optional[RoomData]:
     """Parse a single GMX room file."""
     try:
-        tree = ET.parse(filepath)
-        root = tree.getroot()
-    except Exception as e:
-        print(f"Error parsing {filepath}: {e}")
+        return parse_room_data(filepath, filepath.read_bytes())
+    except OSError as e:
+        print(f"Error reading {filepath}: {e}")
         return None
 
-    room_name = filepath.stem.replace(".room", "")
 
-    # Get dimensions
-    width_elem = root.find("width")
-    height_elem = root.find("height")
-    width = int(width_elem.text) if width_elem is not None and width_elem.text else 0
-    height = (
-        int(height_elem.text) if height_elem is not None and height_elem.text else 0
-    )
+def parse_room_data(filepath: Path, data: bytes) -> Optional[RoomData]:
+    """Parse the contents of a GMX room file."""
+    room_name = filepath.stem.replace(".room", "")
 
-    # Check for rm_points (collectibles allowed)
-    code_elem = root.find("code")
-    room_code = code_elem.text if code_elem is not None and code_elem.text else ""
-    has_collectibles = "rm_points = 1" in room_code
+    width = 0
+    height = 0
+    has_collectibles = False
 
     spawn_points = []
     warps = []
@@ -113,88 +177,92 @@ def parse_room_file(filepath: Path) -> Optional[RoomData]:
     shops = []
     special_objects = []
 
-    instances = root.find("instances")
-    if instances is None:
-        return RoomData(
-            name=room_name,
-            room_index=0,
-            width=width,
-            height=height,
-            has_collectibles=has_collectibles,
-            spawn_points=[],
-            warps=[],
-            npcs=[],
-            shops=[],
-            special_objects=[],
-        )
-
-    for inst in instances.findall("instance"):
-        obj_name = inst.get("objName", "")
-        x = int(float(inst.get("x", 0)))
-        y = int(float(inst.get("y", 0)))
-        code = inst.get("code", "")
-        inst_id = int(inst.get("id", 0))
-
-        code_vars = parse_code_vars(code)
-
-        # Spawn points (slimepoints)
-        if obj_name == "obj_slimepoint":
-            spawn_points.append(SpawnPoint(x=x, y=y))
-
-        # Warps
-        elif obj_name.startswith("warp_"):
-            warp = Warp(
-                x=x,
-                y=y,
-                warp_type=obj_name,
-                next_room=code_vars.get("next_room"),
-                new_x=code_vars.get("new_x"),
-                new_y=code_vars.get("new_y"),
-                code=code,
-            )
-            warps.append(warp)
+    # The instance branch is the tool's hot loop; bind the append methods
+    # up front so each hit is one call instead of attribute lookup + call
+    spawn_append = spawn_points.append
+    warp_append = warps.append
+    npc_append = npcs.append
+    shop_append = shops.append
+    special_append = special_objects.append
 
-        # NPCs
-        elif obj_name.startswith("NPC_"):
-            npcs.append(
-                Instance(obj_name=obj_name, x=x, y=y, code=code, instance_id=inst_id)
-            )
+    try:
+        # Stream the document in one pass; clearing each element as it
+        # completes keeps memory flat instead of retaining the whole tree
+        for _event, elem in ET.iterparse(BytesIO(data), events=("end",)):
+            tag = elem.tag
+            if tag == "instance":
+                # One attrib binding instead of five elem.get method calls
+                attrib = elem.attrib
+                # objName values come from a small fixed vocabulary, but the
+                # parser hands back a fresh str per read; interning shares
+                # one object per name and makes the set lookups pointer
+                # comparisons
+                obj_name = sys.intern(attrib.get("objName", ""))
+                x = int(float(attrib.get("x", "0")))
+                y = int(float(attrib.get("y", "0")))
+                code = attrib.get("code", "")
+                inst_id = int(attrib.get("id", "0"))
+
+                # Spawn points (slimepoints)
+                if obj_name == "obj_slimepoint":
+                    spawn_append(SpawnPoint(x=x, y=y))
+
+                # Warps (the only category that consumes parsed code vars)
+                elif obj_name.startswith("warp_"):
+                    code_vars = parse_code_vars(code)
+                    warp = Warp(
+                        x=x,
+                        y=y,
+                        warp_type=obj_name,
+                        next_room=code_vars.get("next_room"),
+                        new_x=code_vars.get("new_x"),
+                        new_y=code_vars.get("new_y"),
+                    )
+                    warp_append(warp)
+
+                # NPCs
+                elif obj_name.startswith("NPC_"):
+                    npc_append(
+                        Instance(
+                            obj_name=obj_name,
+                            x=x,
+                            y=y,
+                            instance_id=inst_id,
+                        )
+                    )
 
-        # Shops
-        elif obj_name in ["obj_shop_item", "obj_shop_call_item", "obj_sell_sign"]:
-            shops.append(
-                Instance(obj_name=obj_name, x=x, y=y, code=code, instance_id=inst_id)
-            )
+                # Shops
+                elif obj_name in _SHOP_OBJECTS:
+                    shop_append(
+                        Instance(
+                            obj_name=obj_name,
+                            x=x,
+                            y=y,
+                            instance_id=inst_id,
+                        )
+                    )
 
-        # Special objects
-        elif obj_name in [
-            "obj_bank",
-            "obj_mailbox",
-            "obj_storage_box",
-            "obj_save_bg",
-            "obj_clock_stand",
-            "obj_warpcenter",
-            "obj_clan_machine",
-            "obj_post_office",
-            "obj_gum_machine",
-            "obj_soda_machine",
-            "obj_upgrader",
-            "Planting_Field",
-            "Building_Spot",
-            "obj_drill",
-            "obj_race_machine",
-            "obj_race_start_ver",
-            "obj_race_start_hor",
-            "obj_race_end_ver",
-            "obj_race_end_hor",
-            "obj_teleporter",
-            "obj_music_changer",
-            "obj_billboard",
-            "obj_combinator",
-        ]:
-            special_objects.append(
-                Instance(obj_name=obj_name, x=x, y=y, code=code, instance_id=inst_id)
-            )
+                # Special objects
+                elif obj_name in _SPECIAL_OBJECTS:
+                    special_append(
+                        Instance(
+                            obj_name=obj_name,
+                            x=x,
+                            y=y,
+                            instance_id=inst_id,
+                        )
+                    )
+            elif tag == "width":
+                width = int(elem.text) if elem.text else 0
+            elif tag == "height":
+                height = int(elem.text) if elem.text else 0
+            elif tag == "code":
+                # Room-level code; rm_points = 1 enables collectibles
+                has_collectibles = "rm_points = 1" in (elem.text or "")
+            elem.clear()
+    except Exception as e:
+        print(f"Error parsing {filepath}: {e}")
+        return None
 
     return RoomData(
         name=room_name,
@@ -210,6 +278,53 @@ def parse_room_file(filepath: Path) -> Optional[RoomData]:
     )
 
 
+def _room_to_dict(room: RoomData) -> Dict[str, Any]:
+    """Build the JSON-exportable dict for one room."""
+    return {
+        "index": room.room_index,
+        "width": room.width,
+        "height": room.height,
+        "has_collectibles": room.has_collectibles,
+        "spawn_points": [sp._asdict() for sp in room.spawn_points],
+        "warps": [
+            {
+                "x": w.x,
+                "y": w.y,
+                "type": w.warp_type,
+                "next_room": w.next_room,
+                "new_x": w.new_x,
+                "new_y": w.new_y,
+            }
+            for w in room.warps
+        ],
+        "npcs": [n._asdict() for n in room.npcs],
+        "shops": [s._asdict() for s in room.shops],
+        "special_objects": [o._asdict() for o in room.special_objects],
+    }
+
+
+def _dumps(obj: Any) -> bytes:
+    """Serialize one object to compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def _load_room_cache() -> Dict[str, Any]:
+    """Load the parsed-room cache, or an empty one if missing/corrupt."""
+    try:
+        with open(_CACHE_PATH, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return {}
+
+
+def _save_room_cache(cache: Dict[str, Any]) -> None:
+    _CACHE_PATH.parent.mkdir(exist_ok=True)
+    with open(_CACHE_PATH, "wb") as f:
+        pickle.dump(cache, f, pickle.HIGHEST_PROTOCOL)
+
+
 def get_room_order() -> List[str]:
     """Get room order from project file."""
     project_file = GMX_BASE / "slime2_decompile.project.gmx"
@@ -226,7 +341,8 @@ def get_room_order() -> List[str]:
         return []
 
     rooms = []
-    for room in rooms_elem.findall("room"):
+    # iterfind yields lazily instead of materializing the full match list
+    for room in rooms_elem.iterfind("room"):
         if room.text:
             room_name = room.text.replace("rooms\\", "")
             rooms.append(room_name)
@@ -243,34 +359,66 @@ def main():
 
     all_rooms = {}
 
-    # Parse each room file
-    for room_file in sorted(GMX_ROOMS_DIR.glob("*.room.gmx")):
-        room_data = parse_room_file(room_file)
-        if room_data:
-            # Set room index
+    room_files = sorted(GMX_ROOMS_DIR.glob("*.room.gmx"))
+
+    # Reuse cached results for files unchanged since the last run,
+    # keyed on (mtime, size) per path
+    cache = _load_room_cache()
+    fresh_cache = {}
+    stale_files = []
+    for room_file in room_files:
+        stat = room_file.stat()
+        key = str(room_file)
+        entry = cache.get(key)
+        if entry is not None and entry[0] == (stat.st_mtime, stat.st_size):
+            fresh_cache[key] = entry
+        else:
+            stale_files.append((room_file, (stat.st_mtime, stat.st_size)))
+
+    # Room files are independent, so parse the stale ones across all cores
+    if stale_files:
+        with ProcessPoolExecutor() as pool:
+            parsed = pool.map(
+                parse_room_file, [f for f, _ in stale_files], chunksize=8
+            )
+            for (room_file, stamp), room_data in zip(stale_files, parsed):
+                if room_data:
+                    fresh_cache[str(room_file)] = (stamp, room_data)
+
+    _save_room_cache(fresh_cache)
+
+    for room_file in room_files:
+        entry = fresh_cache.get(str(room_file))
+        if entry:
+            room_data = entry[1]
+            # Set room index (not cached; the project order can change
+            # without the room file changing)
             room_data.room_index = room_to_index.get(room_data.name, -1)
             all_rooms[room_data.name] = room_data
 
+    # Sort once by room index; every summary below filters this list
+    ordered_rooms = sorted(all_rooms.values(), key=attrgetter("room_index"))
+
     # Print summary
     print("\n=== ROOM SUMMARY ===\n")
 
     # Rooms with spawn points
-    rooms_with_spawns = [r for r in all_rooms.values() if r.spawn_points]
+    rooms_with_spawns = [r for r in ordered_rooms if r.spawn_points]
     print(f"Rooms with spawn points: {len(rooms_with_spawns)}")
-    for room in sorted(rooms_with_spawns, key=lambda x: x.room_index):
+    for room in rooms_with_spawns:
         print(
             f"  [{room.room_index:3d}] {room.name}: {len(room.spawn_points)} spawn points"
         )
 
     # Rooms with collectibles enabled
     print(f"\nRooms with collectibles enabled (rm_points=1):")
-    collectible_rooms = [r for r in all_rooms.values() if r.has_collectibles]
-    for room in sorted(collectible_rooms, key=lambda x: x.room_index):
-        print(f"  [{room.room_index:3d}] {room.name} ({room.width}x{room.height})")
+    for room in ordered_rooms:
+        if room.has_collectibles:
+            print(f"  [{room.room_index:3d}] {room.name} ({room.width}x{room.height})")
 
     # Warp connections
     print(f"\n=== WARP CONNECTIONS ===\n")
-    for room in sorted(all_rooms.values(), key=lambda x: x.room_index):
+    for room in ordered_rooms:
         if room.warps:
             print(f"[{room.room_index:3d}] {room.name}:")
             for warp in room.warps:
@@ -284,35 +432,18 @@ def main():
                         f"  {warp.warp_type} at ({warp.x}, {warp.y}) -> [{warp.next_room}] {target_name} at ({warp.new_x}, {warp.new_y})"
                     )
 
-    # Export to JSON for server use
-    output = {"rooms": {}, "room_order": room_order}
-
-    for name, room in all_rooms.items():
-        output["rooms"][name] = {
-            "index": room.room_index,
-            "width": room.width,
-            "height": room.height,
-            "has_collectibles": room.has_collectibles,
-            "spawn_points": [asdict(sp) for sp in room.spawn_points],
-            "warps": [
-                {
-                    "x": w.x,
-                    "y": w.y,
-                    "type": w.warp_type,
-                    "next_room": w.next_room,
-                    "new_x": w.new_x,
-                    "new_y": w.new_y,
-                }
-                for w in room.warps
-            ],
-            "npcs": [asdict(n) for n in room.npcs],
-            "shops": [asdict(s) for s in room.shops],
-            "special_objects": [asdict(o) for o in room.special_objects],
-        }
-
+    # Export to JSON for server use, streaming one room at a time so the
+    # full nested output dict never exists alongside the parsed rooms
     output_path = Path("room_data.json")
-    with open(output_path, "w") as f:
-        json.dump(output, f, indent=2)
+    with open(output_path, "wb") as f:
+        f.write(b'{"room_order":' + _dumps(room_order) + b',"rooms":{')
+        first = True
+        for name, room in all_rooms.items():
+            if not first:
+                f.write(b",")
+            first = False
+            f.write(_dumps(name) + b":" + _dumps(_room_to_dict(room)))
+        f.write(b"}}")
 
     print(f"\nRoom data exported to {output_path}")
 